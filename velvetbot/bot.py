@@ -3,36 +3,76 @@ All-in-One Discord Bot for Content Creators & Business
 """
 
 import os
+import atexit
 import asyncio
 import logging
-from datetime import datetime
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+from typing import Callable, Dict, Tuple, Type
 
+import aiohttp
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-from dotenv import load_dotenv
 
-
-# Load environment variables FIRST - before importing Config
-load_dotenv()
 from .config import Config
 from .database import Database
 
 # Configure logging
+# Records are formatted by the QueueHandler and written to file/console by a
+# background listener thread, keeping disk I/O off the event loop.
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler('velvetbot.log'),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('velvetbot.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger('VelvetBot')
 
+# Extensions loaded at startup and by the reload commands
+COGS = (
+    'velvetbot.cogs.moderation',
+    'velvetbot.cogs.engagement',
+    'velvetbot.cogs.streaming',
+    'velvetbot.cogs.clients',
+    'velvetbot.cogs.analytics',
+    'velvetbot.cogs.custom_commands'
+)
+
+# Command error type -> (title, description) for the user-facing error embed
+ERROR_HANDLERS: Dict[Type[Exception], Callable[[Exception], Tuple[str, str]]] = {
+    commands.MissingPermissions: lambda error: (
+        "Missing Permissions",
+        "You don't have permission to use this command."
+    ),
+    commands.MissingRequiredArgument: lambda error: (
+        "Missing Argument",
+        f"Missing required argument: `{error.param.name}`"
+    ),
+    commands.CommandOnCooldown: lambda error: (
+        "Cooldown",
+        f"Try again in {error.retry_after:.1f} seconds."
+    ),
+}
+
 
 class VelvetBot(commands.Bot):
     """Main bot class with enhanced functionality for creators and business."""
 
+    _ERR = Config.COLORS['error']
+    _OK = Config.COLORS['success']
+
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
@@ -48,8 +88,22 @@ class VelvetBot(commands.Bot):
 
         self.config = Config
         self.db = None
-        self.start_time = datetime.utcnow()
+        self.http_session = None
+        self.start_time = datetime.now(timezone.utc)
+        self.start_time_mono = time.monotonic()
         self.version = "1.0.0"
+        self._last_guild_count = -1
+
+        # Embed templates reused by _error_embed/_success_embed
+        self._err_tpl = discord.Embed(color=self._ERR)
+        self._err_tpl.set_footer(text="VelvetBot")
+        self._ok_tpl = discord.Embed(color=self._OK)
+        self._ok_tpl.set_footer(text="VelvetBot")
+
+    @property
+    def uptime(self) -> float:
+        """Seconds since the bot was started (monotonic clock)."""
+        return time.monotonic() - self.start_time_mono
 
     async def setup_hook(self):
         """Initialize database and load cogs."""
@@ -58,29 +112,35 @@ class VelvetBot(commands.Bot):
         await self.db.init()
         logger.info("Database initialized")
 
+        # Shared HTTP session for cogs (bot.http is discord.py's own client)
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+        )
+
         # Load all cogs
-        cogs = [
-            'velvetbot.cogs.moderation',
-            'velvetbot.cogs.engagement',
-            'velvetbot.cogs.streaming',
-            'velvetbot.cogs.clients',
-            'velvetbot.cogs.analytics',
-            'velvetbot.cogs.custom_commands'
-        ]
-
-        for cog in cogs:
-            try:
-                await self.load_extension(cog)
+        results = await asyncio.gather(
+            *(self.load_extension(cog) for cog in COGS),
+            return_exceptions=True
+        )
+        for cog, result in zip(COGS, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to load cog {cog}: {result}")
+            else:
                 logger.info(f"Loaded cog: {cog}")
-            except Exception as e:
-                logger.error(f"Failed to load cog {cog}: {e}")
 
-        # Sync slash commands
-        try:
-            synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} slash commands")
-        except Exception as e:
-            logger.error(f"Failed to sync commands: {e}")
+        # Slash commands are synced on demand via !sync / !syncglobal
+
+        # Keep the server count in the status current
+        self.refresh_presence.start()
+
+    async def close(self):
+        """Shut down, then close the shared HTTP session and database once cogs are unloaded."""
+        self.refresh_presence.cancel()
+        await super().close()
+        if self.http_session:
+            await self.http_session.close()
+        if self.db:
+            await self.db.close()
 
     async def on_ready(self):
         """Called when bot is ready."""
@@ -88,32 +148,49 @@ class VelvetBot(commands.Bot):
         logger.info(f'Bot ID: {self.user.id}')
         logger.info(f'Connected to {len(self.guilds)} guild(s)')
 
-        # Set custom status
+        await self._update_presence()
+
+    async def _update_presence(self):
+        """Set the custom status, skipping the update if the guild count is unchanged."""
+        guild_count = len(self.guilds)
+        if guild_count == self._last_guild_count:
+            return
+
         activity = discord.Activity(
             type=discord.ActivityType.watching,
-            name=f"{len(self.guilds)} servers | {Config.PREFIX}help"
+            name=f"{guild_count} servers | {Config.PREFIX}help"
         )
+        # Also used on IDENTIFY, so the status survives full reconnects
+        self.activity = activity
         await self.change_presence(activity=activity)
+        self._last_guild_count = guild_count
+
+    @tasks.loop(minutes=10)
+    async def refresh_presence(self):
+        """Keep the server count in the status current as guilds come and go."""
+        await self._update_presence()
+
+    @refresh_presence.before_loop
+    async def before_refresh_presence(self):
+        """Wait for the bot to be ready before updating presence."""
+        await self.wait_until_ready()
 
     async def on_command_error(self, ctx, error):
         """Global error handler."""
         if isinstance(error, commands.CommandNotFound):
             return
-        elif isinstance(error, commands.MissingPermissions):
-            await ctx.send(embed=self._error_embed(
-                "Missing Permissions",
-                "You don't have permission to use this command."
-            ))
-        elif isinstance(error, commands.MissingRequiredArgument):
-            await ctx.send(embed=self._error_embed(
-                "Missing Argument",
-                f"Missing required argument: `{error.param.name}`"
-            ))
-        elif isinstance(error, commands.CommandOnCooldown):
-            await ctx.send(embed=self._error_embed(
-                "Cooldown",
-                f"Try again in {error.retry_after:.1f} seconds."
-            ))
+
+        handler = ERROR_HANDLERS.get(type(error))
+        if handler is None:
+            # Fall back to isinstance for subclasses of the handled types
+            handler = next(
+                (h for exc_type, h in ERROR_HANDLERS.items() if isinstance(error, exc_type)),
+                None
+            )
+
+        if handler:
+            title, description = handler(error)
+            await ctx.send(embed=self._error_embed(title, description))
         else:
             logger.error(f"Command error: {error}")
             await ctx.send(embed=self._error_embed(
@@ -123,22 +200,16 @@ class VelvetBot(commands.Bot):
 
     def _error_embed(self, title: str, description: str) -> discord.Embed:
         """Create a standardized error embed."""
-        embed = discord.Embed(
-            title=f"\u274c {title}",
-            description=description,
-            color=Config.COLORS['error']
-        )
-        embed.set_footer(text="VelvetBot")
+        embed = self._err_tpl.copy()
+        embed.title = f"\u274c {title}"
+        embed.description = description
         return embed
 
     def _success_embed(self, title: str, description: str) -> discord.Embed:
         """Create a standardized success embed."""
-        embed = discord.Embed(
-            title=f"\u2705 {title}",
-            description=description,
-            color=Config.COLORS['success']
-        )
-        embed.set_footer(text="VelvetBot")
+        embed = self._ok_tpl.copy()
+        embed.title = f"\u2705 {title}"
+        embed.description = description
         return embed
 
 
@@ -174,29 +245,24 @@ async def fresh_sync(ctx):
     await ctx.send("\u23f3 Starting fresh sync... This may take a moment.")
     
     try:
-        # Clear guild-specific commands
-        bot.tree.clear_commands(guild=ctx.guild)
-        await bot.tree.sync(guild=ctx.guild)
+        # Drop stale guild-specific copies left behind by !sync
+        if ctx.guild:
+            bot.tree.clear_commands(guild=ctx.guild)
+            await bot.tree.sync(guild=ctx.guild)
         
-        # Clear global commands
+        # Clear the local global tree; the cog reloads below re-register it
         bot.tree.clear_commands(guild=None)
-        await bot.tree.sync()
         
         # Reload all cogs to re-register commands
-        cogs = [
-            "velvetbot.cogs.moderation",
-            "velvetbot.cogs.engagement",
-            "velvetbot.cogs.streaming",
-            "velvetbot.cogs.clients",
-            "velvetbot.cogs.analytics",
-            "velvetbot.cogs.custom_commands"
-        ]
-        for cog in cogs:
-            try:
-                await bot.reload_extension(cog)
-            except Exception as e:
-                logger.error(f"Failed to reload {cog}: {e}")
-        # Sync globally
+        results = await asyncio.gather(
+            *(bot.reload_extension(cog) for cog in COGS),
+            return_exceptions=True
+        )
+        for cog, result in zip(COGS, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to reload {cog}: {result}")
+        
+        # Single global bulk overwrite
         synced = await bot.tree.sync()
         
         await ctx.send(f"\u2705 Fresh sync complete! Synced {len(synced)} commands.")
@@ -224,24 +290,18 @@ async def reload_cog(ctx, cog_name: str):
 @commands.is_owner()
 async def reload_all(ctx):
     """Reload all cogs."""
-    cogs = [
-        'velvetbot.cogs.moderation',
-        'velvetbot.cogs.engagement',
-        'velvetbot.cogs.streaming',
-        'velvetbot.cogs.clients',
-        'velvetbot.cogs.analytics',
-        'velvetbot.cogs.custom_commands'
-    ]
-    
     success = []
     failed = []
     
-    for cog in cogs:
-        try:
-            await ctx.bot.reload_extension(cog)
+    results = await asyncio.gather(
+        *(ctx.bot.reload_extension(cog) for cog in COGS),
+        return_exceptions=True
+    )
+    for cog, result in zip(COGS, results):
+        if isinstance(result, Exception):
+            failed.append(f"{cog.split('.')[-1]}: {result}")
+        else:
             success.append(cog.split('.')[-1])
-        except Exception as e:
-            failed.append(f"{cog.split('.')[-1]}: {e}")
     
     msg = f"\u2705 Reloaded: {', '.join(success)}" if success else ""
     if failed:
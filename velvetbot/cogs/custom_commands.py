@@ -11,11 +11,6 @@ class CustomCommands(commands.Cog):
         """Initialize the CustomCommands cog."""
         self.bot = bot
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Called when the bot is ready."""
-        pass
-
 
 async def setup(bot):
     """Load the CustomCommands cog."""
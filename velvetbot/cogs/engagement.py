@@ -11,11 +11,6 @@ class Engagement(commands.Cog):
         """Initialize the Engagement cog."""
         self.bot = bot
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Called when the bot is ready."""
-        pass
-
 
 async def setup(bot):
     """Load the Engagement cog."""
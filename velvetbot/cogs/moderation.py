@@ -1,45 +1,84 @@
 """Moderation Cog - Moderation tools for server management."""
 
+import asyncio
 import discord
 from discord.ext import commands
 from discord import app_commands
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 import logging
 import re
 
+from cachetools import TTLCache
+
 from ..config import Config
 
 logger = logging.getLogger('VelvetBot.Moderation')
 
+_UTC = timezone.utc
+
+# Timeout duration parsing (e.g. 10m, 1h, 7d)
+_DURATION_RE = re.compile(r'(\d+)([smhd])', re.IGNORECASE)
+_TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Fields shared by every moderation embed
+_MOD_EMBED_BASE = {"footer": {"text": "VelvetBot Moderation"}}
+
+# Sentinel for "not looked up yet" in the log channel cache
+_MISSING = object()
+
 
 class Moderation(commands.Cog):
     """Moderation commands for server management."""
 
+    # Embed colors, resolved once
+    _PRIMARY = Config.COLORS['primary']
+    _OK = Config.COLORS['success']
+    _WARN = Config.COLORS['warning']
+    _ERR = Config.COLORS['error']
+    _INFO = Config.COLORS['info']
+
     def __init__(self, bot):
         self.bot = bot
+        # (guild_id, user_id) -> (total, recent) for !warnings
+        self._warn_cache = TTLCache(maxsize=1024, ttl=60)
+        # guild_id -> mod log channel (None if not configured/not found)
+        self._log_channel_cache: Dict[int, Optional[discord.abc.GuildChannel]] = {}
 
     def _create_embed(self, title: str, description: str, color: int = None) -> discord.Embed:
         """Create a branded embed."""
-        embed = discord.Embed(
-            title=title,
-            description=description,
-            color=color or Config.COLORS['primary'],
-            timestamp=datetime.utcnow()
-        )
-        embed.set_footer(text="VelvetBot Moderation")
+        embed = discord.Embed.from_dict({
+            **_MOD_EMBED_BASE,
+            "title": title,
+            "description": description,
+            "color": color or self._PRIMARY
+        })
+        embed.timestamp = datetime.now(_UTC)
         return embed
 
+    def _check_target(self, actor: discord.Member, target: discord.Member, action: str,
+                      *, bot_acts: bool = True) -> Optional[str]:
+        """Return an error message if actor (and the bot, if bot_acts) can't act on target, else None."""
+        target_top = target.top_role
+        if target == actor.guild.owner or target_top >= actor.top_role:
+            return f"\u274c You cannot {action} someone with equal or higher role."
+        if bot_acts and target_top >= actor.guild.me.top_role:
+            return f"\u274c I cannot {action} someone with a role equal to or above mine."
+        return None
+
     async def _log_action(self, guild: discord.Guild, action: str, target: discord.Member, 
                           moderator: discord.Member, reason: str):
         """Log moderation action to log channel and database."""
         # Log to channel
-        log_channel = guild.get_channel(Config.MOD_LOG_CHANNEL)
+        log_channel = self._log_channel_cache.get(guild.id, _MISSING)
+        if log_channel is _MISSING:
+            log_channel = guild.get_channel(Config.MOD_LOG_CHANNEL)
+            self._log_channel_cache[guild.id] = log_channel
         if log_channel:
             embed = self._create_embed(
                 f"\U0001F6E1 {action}",
                 f"**Target:** {target.mention}\n**Moderator:** {moderator.mention}\n**Reason:** {reason}",
-                Config.COLORS['warning']
+                self._WARN
             )
             await log_channel.send(embed=embed)
         
@@ -51,32 +90,32 @@ class Moderation(commands.Cog):
     @commands.has_permissions(kick_members=True)
     async def warn(self, ctx, member: discord.Member, *, reason: str = "No reason provided"):
         """Warn a member."""
-        if member.top_role >= ctx.author.top_role:
-            return await ctx.send("\u274c You cannot warn someone with equal or higher role.")
-        
-        # Log to database
-        if self.bot.db:
-            await self.bot.db.add_warning(member.id, ctx.guild.id, ctx.author.id, reason)
+        error = self._check_target(ctx.author, member, "warn", bot_acts=False)
+        if error:
+            return await ctx.send(error)
         
         embed = self._create_embed(
             "\u26a0 Member Warned",
             f"{member.mention} has been warned.",
-            Config.COLORS['warning']
+            self._WARN
         )
         embed.add_field(name="Reason", value=reason, inline=False)
         embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
-        await ctx.send(embed=embed)
+        dm_embed = self._create_embed(
+            f"\u26a0 Warning in {ctx.guild.name}",
+            f"You have been warned.\n**Reason:** {reason}",
+            self._WARN
+        )
         
-        # DM the user
-        try:
-            dm_embed = self._create_embed(
-                f"\u26a0 Warning in {ctx.guild.name}",
-                f"You have been warned.\n**Reason:** {reason}",
-                Config.COLORS['warning']
-            )
-            await member.send(embed=dm_embed)
-        except discord.Forbidden:
-            pass
+        # Reply in channel, DM the user and store the warning concurrently
+        coros = [ctx.send(embed=embed), member.send(embed=dm_embed)]
+        if self.bot.db:
+            coros.append(self.bot.db.add_warning(member.id, ctx.guild.id, ctx.author.id, reason))
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        self._warn_cache.pop((ctx.guild.id, member.id), None)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, discord.Forbidden):
+                logger.error(f"Failed to process warning for {member}: {result}")
         
         await self._log_action(ctx.guild, "WARN", member, ctx.author, reason)
 
@@ -84,15 +123,16 @@ class Moderation(commands.Cog):
     @commands.has_permissions(kick_members=True)
     async def kick(self, ctx, member: discord.Member, *, reason: str = "No reason provided"):
         """Kick a member from the server."""
-        if member.top_role >= ctx.author.top_role:
-            return await ctx.send("\u274c You cannot kick someone with equal or higher role.")
+        error = self._check_target(ctx.author, member, "kick")
+        if error:
+            return await ctx.send(error)
         
         # DM before kick
         try:
             dm_embed = self._create_embed(
                 f"\U0001F462 Kicked from {ctx.guild.name}",
                 f"You have been kicked.\n**Reason:** {reason}",
-                Config.COLORS['error']
+                self._ERR
             )
             await member.send(embed=dm_embed)
         except discord.Forbidden:
@@ -103,7 +143,7 @@ class Moderation(commands.Cog):
         embed = self._create_embed(
             "\U0001F462 Member Kicked",
             f"{member.mention} has been kicked.",
-            Config.COLORS['error']
+            self._ERR
         )
         embed.add_field(name="Reason", value=reason, inline=False)
         await ctx.send(embed=embed)
@@ -113,15 +153,16 @@ class Moderation(commands.Cog):
     @commands.has_permissions(ban_members=True)
     async def ban(self, ctx, member: discord.Member, *, reason: str = "No reason provided"):
         """Ban a member from the server."""
-        if member.top_role >= ctx.author.top_role:
-            return await ctx.send("\u274c You cannot ban someone with equal or higher role.")
+        error = self._check_target(ctx.author, member, "ban")
+        if error:
+            return await ctx.send(error)
         
         # DM before ban
         try:
             dm_embed = self._create_embed(
                 f"\U0001F6AB Banned from {ctx.guild.name}",
                 f"You have been banned.\n**Reason:** {reason}",
-                Config.COLORS['error']
+                self._ERR
             )
             await member.send(embed=dm_embed)
         except discord.Forbidden:
@@ -132,7 +173,7 @@ class Moderation(commands.Cog):
         embed = self._create_embed(
             "\U0001F6AB Member Banned",
             f"{member.mention} has been banned.",
-            Config.COLORS['error']
+            self._ERR
         )
         embed.add_field(name="Reason", value=reason, inline=False)
         await ctx.send(embed=embed)
@@ -143,13 +184,13 @@ class Moderation(commands.Cog):
     async def unban(self, ctx, user_id: int, *, reason: str = "No reason provided"):
         """Unban a user by their ID."""
         try:
-            user = await self.bot.fetch_user(user_id)
-            await ctx.guild.unban(user, reason=f"{ctx.author}: {reason}")
+            # unban only needs the ID; no need to fetch the user first
+            await ctx.guild.unban(discord.Object(id=user_id), reason=f"{ctx.author}: {reason}")
             
             embed = self._create_embed(
                 "\u2705 User Unbanned",
-                f"{user.mention} has been unbanned.",
-                Config.COLORS['success']
+                f"<@{user_id}> has been unbanned.",
+                self._OK
             )
             await ctx.send(embed=embed)
         except discord.NotFound:
@@ -159,30 +200,28 @@ class Moderation(commands.Cog):
     @commands.has_permissions(moderate_members=True)
     async def mute(self, ctx, member: discord.Member, duration: str = "1h", *, reason: str = "No reason provided"):
         """Timeout a member. Duration examples: 10m, 1h, 1d, 7d"""
-        if member.top_role >= ctx.author.top_role:
-            return await ctx.send("\u274c You cannot mute someone with equal or higher role.")
+        error = self._check_target(ctx.author, member, "mute")
+        if error:
+            return await ctx.send(error)
         
         # Parse duration
-        time_units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
-        match = re.match(r'(\d+)([smhd])', duration.lower())
-        
+        match = _DURATION_RE.fullmatch(duration.strip())
         if not match:
             return await ctx.send("\u274c Invalid duration. Use format: 10m, 1h, 1d")
         
-        amount, unit = int(match.group(1)), match.group(2)
-        seconds = amount * time_units[unit]
+        seconds = int(match.group(1)) * _TIME_UNITS[match.group(2).lower()]
         
         # Discord timeout max is 28 days
         if seconds > 28 * 86400:
             return await ctx.send("\u274c Maximum timeout is 28 days.")
         
-        until = datetime.utcnow() + timedelta(seconds=seconds)
+        until = datetime.now(_UTC) + timedelta(seconds=seconds)
         await member.timeout(until, reason=f"{ctx.author}: {reason}")
         
         embed = self._create_embed(
             "\U0001F507 Member Muted",
             f"{member.mention} has been timed out for {duration}.",
-            Config.COLORS['warning']
+            self._WARN
         )
         embed.add_field(name="Reason", value=reason, inline=False)
         await ctx.send(embed=embed)
@@ -196,7 +235,7 @@ class Moderation(commands.Cog):
         embed = self._create_embed(
             "\U0001F50A Member Unmuted",
             f"{member.mention} has been unmuted.",
-            Config.COLORS['success']
+            self._OK
         )
         await ctx.send(embed=embed)
 
@@ -207,14 +246,24 @@ class Moderation(commands.Cog):
         if amount > 100:
             amount = 100
         
-        deleted = await ctx.channel.purge(limit=amount + 1)
+        if ctx.interaction:
+            # Slash invocation: no command message to remove, reply ephemerally
+            await ctx.defer(ephemeral=True)
+            deleted = await ctx.channel.purge(limit=amount, bulk=True)
+            count = len(deleted)
+        else:
+            deleted = await ctx.channel.purge(limit=amount + 1, bulk=True)
+            count = len(deleted) - 1
+        
         embed = self._create_embed(
             "\U0001F9F9 Messages Purged",
-            f"Deleted {len(deleted) - 1} messages.",
-            Config.COLORS['info']
+            f"Deleted {count} messages.",
+            self._INFO
         )
-        msg = await ctx.send(embed=embed)
-        await msg.delete(delay=3)
+        if ctx.interaction:
+            await ctx.send(embed=embed, ephemeral=True)
+        else:
+            await ctx.send(embed=embed, delete_after=3)
 
     @commands.hybrid_command(name="slowmode", description="Set channel slowmode")
     @commands.has_permissions(manage_channels=True)
@@ -229,13 +278,13 @@ class Moderation(commands.Cog):
             embed = self._create_embed(
                 "\U0001F40C Slowmode Disabled",
                 "Slowmode has been disabled.",
-                Config.COLORS['success']
+                self._OK
             )
         else:
             embed = self._create_embed(
                 "\U0001F40C Slowmode Enabled",
                 f"Slowmode set to {seconds} seconds.",
-                Config.COLORS['info']
+                self._INFO
             )
         await ctx.send(embed=embed)
 
@@ -243,18 +292,23 @@ class Moderation(commands.Cog):
     @commands.has_permissions(kick_members=True)
     async def warnings(self, ctx, member: discord.Member):
         """View warnings for a member."""
-        if self.bot.db:
-            warns = await self.bot.db.get_warnings(member.id, ctx.guild.id)
+        key = (ctx.guild.id, member.id)
+        cached = self._warn_cache.get(key)
+        if cached:
+            total, recent = cached
+        elif self.bot.db:
+            total, recent = await self.bot.db.get_warnings(member.id, ctx.guild.id, limit=5)
+            self._warn_cache[key] = (total, recent)
         else:
-            warns = []
+            total, recent = 0, []
         
         embed = self._create_embed(
             f"Warnings for {member.display_name}",
-            f"Total warnings: {len(warns)}",
-            Config.COLORS['info']
+            f"Total warnings: {total}",
+            self._INFO
         )
         
-        for i, warn in enumerate(warns[-5:], 1):
+        for i, warn in enumerate(reversed(recent), 1):
             embed.add_field(
                 name=f"Warning {i}",
                 value=f"**Reason:** {warn.get('reason', 'N/A')}\n**Date:** {warn.get('created_at', 'N/A')}",
@@ -269,28 +323,44 @@ class Moderation(commands.Cog):
         """Clear all warnings for a member."""
         if self.bot.db:
             await self.bot.db.clear_warnings(member.id, ctx.guild.id)
+        self._warn_cache.pop((ctx.guild.id, member.id), None)
         
         embed = self._create_embed(
             "\u2705 Warnings Cleared",
             f"Cleared all warnings for {member.mention}.",
-            Config.COLORS['success']
+            self._OK
         )
         await ctx.send(embed=embed)
 
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        """Drop the cached log channel if it was deleted."""
+        if channel.id == Config.MOD_LOG_CHANNEL:
+            self._log_channel_cache.pop(channel.guild.id, None)
+
     @commands.Cog.listener()
     async def on_message(self, message):
         """Auto-moderation listener."""
-        if message.author.bot or not message.guild:
+        # Cheap substring test first: most messages contain no mentions at all
+        if message.author.bot or not message.guild or '<@' not in message.content:
             return
         
         # Check for excessive mentions (potential spam)
-        if len(message.mentions) > 5:
-            await message.delete()
-            await message.channel.send(
-                f"{message.author.mention}, please don't spam mentions.",
-                delete_after=5
+        if len(message.mentions) > Config.MAX_MENTIONS:
+            deleted, notice = await asyncio.gather(
+                message.delete(),
+                message.channel.send(
+                    f"{message.author.mention}, please don't spam mentions.",
+                    delete_after=5
+                ),
+                return_exceptions=True
             )
-            logger.info(f"Auto-deleted mention spam from {message.author} in {message.guild}")
+            # NotFound just means the message is already gone
+            for result in (deleted, notice):
+                if isinstance(result, Exception) and not isinstance(result, discord.NotFound):
+                    logger.error(f"Auto-moderation in {message.guild} failed: {result}")
+            if not isinstance(deleted, Exception) and logger.isEnabledFor(logging.INFO):
+                logger.info(f"Auto-deleted mention spam from {message.author} in {message.guild}")
 
 
 async def setup(bot):
@@ -3,18 +3,38 @@
 Handles Twitch, YouTube, and TikTok stream notifications.
 """
 
+import asyncio
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-import aiohttp
 import logging
-from datetime import datetime
-from typing import Optional
+import time
+import orjson
+from aiolimiter import AsyncLimiter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 
 from ..config import Config
 
 logger = logging.getLogger('VelvetBot.Streaming')
 
+_UTC = timezone.utc
+
+# YouTube poll interval per channel: doubles while offline, up to the max
+YOUTUBE_POLL_INTERVAL = 180  # seconds, matches the check_youtube_streams loop
+YOUTUBE_MAX_POLL_INTERVAL = 1800
+YOUTUBE_START_DELAY = 30  # seconds, staggers YouTube polls from the Twitch ones
+
+# Fills the {width}x{height} placeholders in Helix thumbnail_url templates
+_TWITCH_THUMBNAIL_SIZE = {"width": "1280", "height": "720"}
+
+# Platform-specific colors and emojis for notifications
+_PLATFORM_INFO = {
+    "twitch": {"color": 0x9146FF, "emoji": "\U0001F7E3", "name": "Twitch"},
+    "youtube": {"color": 0xFF0000, "emoji": "\U0001F534", "name": "YouTube"},
+    "tiktok": {"color": 0x000000, "emoji": "\U0001F3B5", "name": "TikTok"}
+}
+
 
 class Streaming(commands.Cog):
     """Cog for stream monitoring and notifications."""
@@ -24,10 +44,18 @@ class Streaming(commands.Cog):
         self.bot = bot
         self.twitch_token = None
         self.twitch_token_expires = None
-        self.live_streams = {}  # Track currently live streams
+        self.live_streams = {}  # channel (or "yt_<channel_id>") -> current stream/video ID
+        self.session = None  # Shared aiohttp session, owned by the bot
+        self._notify_channel = None  # Resolved lazily; the cache is empty before ready
+        self._notify_limiter = AsyncLimiter(30, 60)  # at most 30 notifications per minute
+        self._ping_content = f"<@&{Config.STREAM_PING_ROLE}>" if Config.STREAM_PING_ROLE else ""
+        self._yt_etags: Dict[str, str] = {}  # channel_id -> last search ETag
+        self._yt_intervals: Dict[str, float] = {}  # channel_id -> current poll interval
+        self._yt_next_poll: Dict[str, float] = {}  # channel_id -> monotonic time of next poll
         
     async def cog_load(self):
         """Start background tasks when cog loads."""
+        self.session = self.bot.http_session
         if Config.TWITCH_CLIENT_ID and Config.TWITCH_CLIENT_SECRET:
             self.check_twitch_streams.start()
             logger.info("Twitch stream checker started")
@@ -43,7 +71,7 @@ class Streaming(commands.Cog):
     async def get_twitch_token(self) -> Optional[str]:
         """Get or refresh Twitch OAuth token."""
         if self.twitch_token and self.twitch_token_expires:
-            if datetime.utcnow() < self.twitch_token_expires:
+            if datetime.now(_UTC) < self.twitch_token_expires:
                 return self.twitch_token
         
         url = "https://id.twitch.tv/oauth2/token"
@@ -53,13 +81,16 @@ class Streaming(commands.Cog):
             "grant_type": "client_credentials"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    self.twitch_token = data["access_token"]
-                    return self.twitch_token
-        return None
+        async with self.session.post(url, params=params) as resp:
+            if resp.status != 200:
+                logger.error(f"Twitch token request failed ({resp.status}): {await resp.text()}")
+                return None
+            data = orjson.loads(await resp.read())
+        
+        self.twitch_token = data["access_token"]
+        # Refresh 5 minutes before the token actually expires
+        self.twitch_token_expires = datetime.now(_UTC) + timedelta(seconds=data.get("expires_in", 3600) - 300)
+        return self.twitch_token
 
     @tasks.loop(minutes=2)
     async def check_twitch_streams(self):
@@ -77,96 +108,152 @@ class Streaming(commands.Cog):
             "Authorization": f"Bearer {token}"
         }
         
-        for channel in Config.TWITCH_CHANNELS:
-            url = f"https://api.twitch.tv/helix/streams?user_login={channel}"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        streams = data.get("data", [])
-                        
-                        if streams:
-                            stream = streams[0]
-                            stream_id = stream["id"]
-                            
-                            # Only notify if this is a new stream
-                            if stream_id not in self.live_streams:
-                                self.live_streams[stream_id] = stream
-                                await self.send_stream_notification(
-                                    platform="twitch",
-                                    channel=channel,
-                                    title=stream["title"],
-                                    game=stream.get("game_name", "Unknown"),
-                                    thumbnail=stream["thumbnail_url"].replace("{width}", "1280").replace("{height}", "720"),
-                                    url=f"https://twitch.tv/{channel}"
-                                )
-                        else:
-                            # Stream ended, remove from tracking
-                            self.live_streams = {k: v for k, v in self.live_streams.items() 
-                                                if v.get("user_login") != channel}
+        # Helix accepts up to 100 user_login params per request
+        channels = Config.TWITCH_CHANNELS
+        batches = [channels[i:i + 100] for i in range(0, len(channels), 100)]
+        results = await asyncio.gather(
+            *(self._fetch_twitch_streams(batch, headers) for batch in batches),
+            return_exceptions=True
+        )
+        
+        live = {}
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Twitch stream check failed: {result}")
+                return
+            live.update(result)
+        
+        for channel in channels:
+            stream = live.get(channel.lower())
+            if stream:
+                stream_id = stream["id"]
+                
+                # Only notify if this is a new stream
+                if self.live_streams.get(channel) != stream_id:
+                    self.live_streams[channel] = stream_id
+                    await self.send_stream_notification(
+                        platform="twitch",
+                        channel=channel,
+                        title=stream["title"],
+                        game=stream.get("game_name", "Unknown"),
+                        thumbnail=stream["thumbnail_url"].format_map(_TWITCH_THUMBNAIL_SIZE),
+                        url=f"https://twitch.tv/{channel}"
+                    )
+            else:
+                # Stream ended, remove from tracking
+                self.live_streams.pop(channel, None)
+
+    async def _fetch_twitch_streams(self, channels: List[str], headers: Dict[str, str]) -> Dict[str, dict]:
+        """Fetch live streams for up to 100 channels, keyed by lowercase user_login."""
+        url = "https://api.twitch.tv/helix/streams"
+        params = [("user_login", channel) for channel in channels]
+        
+        async with self.session.get(url, headers=headers, params=params) as resp:
+            if resp.status == 401:
+                # Twitch can revoke app tokens early; drop it so the next poll requests a new one
+                self.twitch_token = None
+                self.twitch_token_expires = None
+            if resp.status != 200:
+                raise RuntimeError(f"Helix /streams returned HTTP {resp.status}")
+            data = orjson.loads(await resp.read())
+        return {stream["user_login"].lower(): stream for stream in data.get("data", [])}
 
     @tasks.loop(minutes=3)
     async def check_youtube_streams(self):
         """Check if configured YouTube channels are live."""
         if not Config.YOUTUBE_CHANNELS or not Config.YOUTUBE_API_KEY:
             return
+        
+        # The search endpoint takes one channel per request, so fan out
+        results = await asyncio.gather(
+            *(self._poll_youtube(channel_id) for channel_id in Config.YOUTUBE_CHANNELS),
+            return_exceptions=True
+        )
+        for channel_id, result in zip(Config.YOUTUBE_CHANNELS, results):
+            if isinstance(result, Exception):
+                logger.error(f"YouTube stream check failed for {channel_id}: {result}")
+
+    async def _poll_youtube(self, channel_id: str):
+        """Check a single YouTube channel and notify if it has gone live."""
+        if time.monotonic() < self._yt_next_poll.get(channel_id, 0):
+            return
+        
+        url = "https://www.googleapis.com/youtube/v3/search"
+        params = {
+            "part": "snippet",
+            "channelId": channel_id,
+            "eventType": "live",
+            "type": "video",
+            "key": Config.YOUTUBE_API_KEY
+        }
+        
+        headers = {}
+        if channel_id in self._yt_etags:
+            headers["If-None-Match"] = self._yt_etags[channel_id]
+        
+        key = f"yt_{channel_id}"
+        async with self.session.get(url, params=params, headers=headers) as resp:
+            if resp.status == 304:
+                # Unchanged since the last poll, nothing to parse
+                self._schedule_youtube_poll(channel_id, live=key in self.live_streams)
+                return
+            if resp.status != 200:
+                return
+            if "ETag" in resp.headers:
+                self._yt_etags[channel_id] = resp.headers["ETag"]
+            data = orjson.loads(await resp.read())
+        
+        items = data.get("items", [])
+        self._schedule_youtube_poll(channel_id, live=bool(items))
+        if items:
+            video = items[0]
+            video_id = video["id"]["videoId"]
             
-        for channel_id in Config.YOUTUBE_CHANNELS:
-            url = "https://www.googleapis.com/youtube/v3/search"
-            params = {
-                "part": "snippet",
-                "channelId": channel_id,
-                "eventType": "live",
-                "type": "video",
-                "key": Config.YOUTUBE_API_KEY
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        items = data.get("items", [])
-                        
-                        if items:
-                            video = items[0]
-                            video_id = video["id"]["videoId"]
-                            
-                            if f"yt_{video_id}" not in self.live_streams:
-                                self.live_streams[f"yt_{video_id}"] = video
-                                snippet = video["snippet"]
-                                await self.send_stream_notification(
-                                    platform="youtube",
-                                    channel=snippet["channelTitle"],
-                                    title=snippet["title"],
-                                    game="Live Stream",
-                                    thumbnail=snippet["thumbnails"]["high"]["url"],
-                                    url=f"https://youtube.com/watch?v={video_id}"
-                                )
+            if self.live_streams.get(key) != video_id:
+                self.live_streams[key] = video_id
+                snippet = video["snippet"]
+                await self.send_stream_notification(
+                    platform="youtube",
+                    channel=snippet["channelTitle"],
+                    title=snippet["title"],
+                    game="Live Stream",
+                    thumbnail=snippet["thumbnails"]["high"]["url"],
+                    url=f"https://youtube.com/watch?v={video_id}"
+                )
+        else:
+            self.live_streams.pop(key, None)
+
+    def _schedule_youtube_poll(self, channel_id: str, live: bool):
+        """Back off polling for offline channels (3 -> 6 -> 12 ... up to 30 minutes)."""
+        if live:
+            interval = YOUTUBE_POLL_INTERVAL
+        else:
+            interval = min(self._yt_intervals.get(channel_id, YOUTUBE_POLL_INTERVAL / 2) * 2,
+                           YOUTUBE_MAX_POLL_INTERVAL)
+        self._yt_intervals[channel_id] = interval
+        # Small slack so the next loop tick isn't skipped by timer jitter
+        self._yt_next_poll[channel_id] = time.monotonic() + interval - 5
 
     async def send_stream_notification(self, platform: str, channel: str, title: str, 
                                        game: str, thumbnail: str, url: str):
         """Send a stream notification to the configured channel."""
-        notification_channel = self.bot.get_channel(Config.STREAM_NOTIFICATION_CHANNEL)
+        if self._notify_channel is None:
+            self._notify_channel = self.bot.get_channel(Config.STREAM_NOTIFICATION_CHANNEL)
+        notification_channel = self._notify_channel
         if not notification_channel:
             logger.error(f"Stream notification channel not found: {Config.STREAM_NOTIFICATION_CHANNEL}")
             return
 
-        # Platform-specific colors and emojis
-        platform_info = {
-            "twitch": {"color": 0x9146FF, "emoji": "\U0001F7E3", "name": "Twitch"},
-            "youtube": {"color": 0xFF0000, "emoji": "\U0001F534", "name": "YouTube"},
-            "tiktok": {"color": 0x000000, "emoji": "\U0001F3B5", "name": "TikTok"}
-        }
-        
-        info = platform_info.get(platform, {"color": Config.COLORS['primary'], "emoji": "\U0001F4FA", "name": platform})
+        info = _PLATFORM_INFO.get(
+            platform, {"color": Config.COLORS['primary'], "emoji": "\U0001F4FA", "name": platform}
+        )
         
         embed = discord.Embed(
             title=f"{info['emoji']} {channel} is LIVE!",
             description=f"**{title}**",
             color=info['color'],
             url=url,
-            timestamp=datetime.utcnow()
+            timestamp=datetime.now(_UTC)
         )
         
         embed.add_field(name="Platform", value=info['name'], inline=True)
@@ -175,11 +262,8 @@ class Streaming(commands.Cog):
         embed.set_footer(text="VelvetBot Stream Alerts")
         
         # Mention role if configured
-        content = ""
-        if Config.STREAM_PING_ROLE:
-            content = f"<@&{Config.STREAM_PING_ROLE}>"
-        
-        await notification_channel.send(content=content, embed=embed)
+        async with self._notify_limiter:
+            await notification_channel.send(content=self._ping_content, embed=embed)
         logger.info(f"Sent {platform} notification for {channel}")
         
         # Log to database
@@ -266,7 +350,7 @@ class Streaming(commands.Cog):
         embed = discord.Embed(
             title="\U0001F4CA Stream Statistics",
             color=Config.COLORS['primary'],
-            timestamp=datetime.utcnow()
+            timestamp=datetime.now(_UTC)
         )
         
         # Get stats from database if available
@@ -282,11 +366,16 @@ class Streaming(commands.Cog):
         await ctx.send(embed=embed)
 
     @check_twitch_streams.before_loop
-    @check_youtube_streams.before_loop
     async def before_stream_check(self):
         """Wait for bot to be ready before starting stream checks."""
         await self.bot.wait_until_ready()
 
+    @check_youtube_streams.before_loop
+    async def before_youtube_check(self):
+        """Wait for ready, then offset YouTube polls from the Twitch ones."""
+        await self.bot.wait_until_ready()
+        await asyncio.sleep(YOUTUBE_START_DELAY)
+
 
 async def setup(bot):
     """Load the Streaming cog."""
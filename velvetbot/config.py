@@ -3,8 +3,15 @@ Environment-based configuration using Velvet & Sage brand colors.
 """
 
 import os
+from pathlib import Path
 from typing import Dict, Any, List
 
+from dotenv import load_dotenv
+
+# Load .env from the project root once, before any settings are read.
+ENV_PATH = Path(__file__).resolve().parent.parent / '.env'
+load_dotenv(dotenv_path=ENV_PATH)
+
 class Config:
     """Bot configuration settings."""
     
@@ -53,27 +60,13 @@ class Config:
     TWITCH_USERNAME = os.getenv('TWITCH_USERNAME', '')
     
     # Twitch channels to monitor (list)
-    @classmethod
-    def get_twitch_channels(cls) -> List[str]:
-        username = cls.TWITCH_USERNAME
-        if username:
-            return [username]
-        return []
-    
-    TWITCH_CHANNELS: List[str] = property(lambda self: Config.get_twitch_channels())
+    TWITCH_CHANNELS: List[str] = [TWITCH_USERNAME] if TWITCH_USERNAME else []
     
     YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY', '')
     YOUTUBE_CHANNEL_ID = os.getenv('YOUTUBE_CHANNEL_ID', '')
     
     # YouTube channels to monitor (list)
-    @classmethod
-    def get_youtube_channels(cls) -> List[str]:
-        channel_id = cls.YOUTUBE_CHANNEL_ID
-        if channel_id:
-            return [channel_id]
-        return []
-    
-    YOUTUBE_CHANNELS: List[str] = property(lambda self: Config.get_youtube_channels())
+    YOUTUBE_CHANNELS: List[str] = [YOUTUBE_CHANNEL_ID] if YOUTUBE_CHANNEL_ID else []
     
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///sqlite:///velvetbot.db')
@@ -108,7 +101,3 @@ class Config:
     def get_color(cls, color_type: str) -> int:
         """Get a color from the palette."""
         return cls.COLORS.get(color_type, cls.COLORS['primary'])
-
-# Create class-level list attributes
-Config.INIT_CHANNELS = Config.get_twitch_channels()
-Config.YOUTUBE_CHANNELS = Config.get_youtube_channels()
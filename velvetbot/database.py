@@ -2,35 +2,97 @@
 SQLAlchemy async database with models for users, tickets, clients, and more.
 """
 
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
 
-from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Float, Text, select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from cachetools import TTLCache
+from sqlalchemy import (
+    Column, Computed, Table, Integer, BigInteger, String, DateTime, Boolean, Float, Text, Index, UniqueConstraint,
+    bindparam, delete, event, insert, inspect, select, text, update, func
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base, make_transient_to_detached
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.expression import FunctionElement
 
 from .config import Config
 
+logger = logging.getLogger('VelvetBot.Database')
+
 Base = declarative_base()
 
 
+class _UtcNow(FunctionElement):
+    """Current time as a naive UTC timestamp, matching what the DateTime columns store."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(_UtcNow)
+def _compile_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(_UtcNow, 'postgresql')
+def _compile_utcnow_pg(element, compiler, **kw):
+    # now() is in the session's TimeZone; convert before it lands in a timestamp without time zone
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+# Queued inserts are written at most this often, in batches of up to this many rows
+_WRITE_FLUSH_INTERVAL = 0.2
+_WRITE_BATCH_SIZE = 500
+# After a failed write the rows are kept and retried this much later (seconds)
+_WRITE_RETRY_DELAY = 5
+# Buffered XP and command-use counts are written out this often (seconds)
+_COUNTER_FLUSH_INTERVAL = 5
+
+# Backends with the INSERT ... ON CONFLICT upserts the XP and custom command writes rely on
+_SUPPORTED_DIALECTS = ('postgresql', 'sqlite')
+
+# Marks a cached "no such row" result, as opposed to a cache miss
+_NOT_FOUND = object()
+
+
+# Timestamp columns keep a client-side default next to the server default: create_all never
+# alters existing tables, so ones created before the server defaults would otherwise get NULL.
+
+
 class User(Base):
     """User model for XP and leveling system."""
     __tablename__ = 'users'
+    __table_args__ = (
+        # A user has one row per guild; also the ON CONFLICT target for add_xp
+        UniqueConstraint('user_id', 'guild_id', name='uq_user_guild'),
+        # Leaderboard: WHERE guild_id ORDER BY xp DESC
+        Index('ix_user_guild_xp', 'guild_id', 'xp'),
+    )
+    # Fetch level and the server timestamps via INSERT ... RETURNING instead of a later SELECT
+    __mapper_args__ = {'eager_defaults': True}
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(BigInteger, unique=True, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
     guild_id = Column(BigInteger, nullable=False)
     xp = Column(Integer, default=0)
-    level = Column(Integer, default=1)
+    # Derived from xp by the database (level = xp / 100 + 1)
+    level = Column(Integer, Computed('(xp / 100) + 1', persisted=True))
     messages = Column(Integer, default=0)
-    last_xp = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    last_xp = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow(), onupdate=_UtcNow())
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
 
 
 class Ticket(Base):
     """Support ticket model."""
     __tablename__ = 'tickets'
+    __table_args__ = (
+        Index('ix_ticket_guild_status', 'guild_id', 'status'),
+    )
     
     id = Column(Integer, primary_key=True)
     ticket_id = Column(String(50), unique=True, nullable=False)
@@ -39,7 +101,7 @@ class Ticket(Base):
     channel_id = Column(BigInteger, nullable=True)
     category = Column(String(100), nullable=False)
     status = Column(String(20), default='open')
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
     closed_at = Column(DateTime, nullable=True)
 
 
@@ -55,18 +117,21 @@ class Client(Base):
     service_type = Column(String(100), nullable=True)
     revenue = Column(Float, default=0.0)
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
 
 
 class StreamAlert(Base):
     """Stream alert history."""
     __tablename__ = 'stream_alerts'
+    __table_args__ = (
+        Index('ix_stream_started_at', 'started_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     platform = Column(String(50), nullable=False)
     channel = Column(String(100), nullable=True)
     stream_title = Column(String(255), nullable=True)
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
     ended_at = Column(DateTime, nullable=True)
     peak_viewers = Column(Integer, default=0)
     notified = Column(Boolean, default=False)
@@ -75,6 +140,10 @@ class StreamAlert(Base):
 class CustomCommand(Base):
     """Custom command storage."""
     __tablename__ = 'custom_commands'
+    __table_args__ = (
+        # Name lookups, and the ON CONFLICT target for save_custom_command
+        UniqueConstraint('guild_id', 'name', name='uq_cmd_guild_name'),
+    )
     
     id = Column(Integer, primary_key=True)
     guild_id = Column(BigInteger, nullable=False)
@@ -83,126 +152,492 @@ class CustomCommand(Base):
     created_by = Column(BigInteger, nullable=False)
     uses = Column(Integer, default=0)
     is_embed = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
 
 
 class WarnLog(Base):
     """Moderation warning logs."""
     __tablename__ = 'warn_logs'
+    __table_args__ = (
+        Index('ix_warn_user_guild', 'user_id', 'guild_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, nullable=False)
     guild_id = Column(BigInteger, nullable=False)
     moderator_id = Column(BigInteger, nullable=False)
     reason = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=_UtcNow())
+
+
+# Prebuilt statements for the hot lookups; values are bound at execute time
+_SEL_LEADERBOARD = (
+    select(User.user_id, User.xp, User.level)
+    .where(User.guild_id == bindparam('gid'))
+    .order_by(User.xp.desc())
+    .limit(bindparam('limit', type_=Integer))
+)
+_SEL_USER = select(User).where(User.user_id == bindparam('uid'), User.guild_id == bindparam('gid'))
+_SEL_WARNINGS = (
+    # count() OVER () is evaluated before LIMIT, so it carries the full total
+    select(WarnLog.reason, WarnLog.created_at, func.count().over())
+    .where(WarnLog.user_id == bindparam('uid'), WarnLog.guild_id == bindparam('gid'))
+    .order_by(WarnLog.created_at.desc(), WarnLog.id.desc())
+    .limit(bindparam('limit', type_=Integer))
+)
+_DEL_WARNINGS = delete(WarnLog).where(WarnLog.user_id == bindparam('uid'), WarnLog.guild_id == bindparam('gid'))
+_SEL_CMD = select(CustomCommand).where(
+    CustomCommand.guild_id == bindparam('gid'), CustomCommand.name == bindparam('name')
+)
+_SEL_GUILD_CMDS = select(CustomCommand).where(CustomCommand.guild_id == bindparam('gid'))
+# Core table UPDATE, so a list of parameters runs as a plain executemany
+_INCR_CMD_USES = (
+    update(CustomCommand.__table__)
+    .where(CustomCommand.__table__.c.id == bindparam('cid'))
+    .values(uses=CustomCommand.__table__.c.uses + bindparam('n'))
+)
+
+
+def _column_values(obj: Base) -> Dict[str, Any]:
+    """Plain column values of an ORM instance, for caching without holding on to the instance."""
+    return {attr.key: getattr(obj, attr.key) for attr in type(obj).__mapper__.column_attrs}
+
+
+def _detached_copy(model, values: Dict[str, Any]):
+    """Fresh detached instance with clean history; adding it to a session writes nothing unless changed."""
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+
+def _copy_value(row: Dict[str, Any], column: Column) -> Any:
+    """Value of a column for COPY, applying the client-side default INSERT would have used."""
+    value = row.get(column.key)
+    if value is None and column.default is not None:
+        value = column.default.arg(None) if column.default.is_callable else column.default.arg
+    return value
+
+
+_SQLITE_PRAGMAS = (
+    'journal_mode=WAL',  # readers don't block the writer
+    'synchronous=NORMAL',  # safe with WAL, skips an fsync per commit
+    'cache_size=-65536',  # 64 MiB page cache
+    'mmap_size=268435456',
+    'temp_store=MEMORY',
+    'foreign_keys=ON',
+)
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    """Tune each new SQLite connection."""
+    cursor = dbapi_conn.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+def _users_table_is_current(sync_conn) -> bool:
+    """Whether an existing users table has the (user_id, guild_id) key and computed level."""
+    insp = inspect(sync_conn)
+    per_guild = any(
+        set(uc['column_names']) == {'user_id', 'guild_id'} for uc in insp.get_unique_constraints('users')
+    )
+    level = next(c for c in insp.get_columns('users') if c['name'] == 'level')
+    return per_guild and level.get('computed') is not None
+
+
+def _upgrade_users_table(sync_conn):
+    """Rebuild a users table created by an older version."""
+    if not inspect(sync_conn).has_table('users') or _users_table_is_current(sync_conn):
+        return
+    dialect = sync_conn.dialect.name
+    
+    # Constraints and generated columns can't be added in place on SQLite, so rebuild the table
+    logger.warning("Upgrading the users table to the per-guild XP schema")
+    sync_conn.execute(text('ALTER TABLE users RENAME TO users_old'))
+    # Free up names a partially upgraded table may already use (PostgreSQL index names are per schema)
+    if dialect == 'postgresql':
+        sync_conn.execute(text('ALTER TABLE users_old DROP CONSTRAINT IF EXISTS uq_user_guild'))
+    sync_conn.execute(text('DROP INDEX IF EXISTS ix_user_guild_xp'))
+    User.__table__.create(sync_conn)
+    sync_conn.execute(text(
+        'INSERT INTO users (user_id, guild_id, xp, messages, last_xp, created_at) '
+        'SELECT user_id, guild_id, COALESCE(xp, 0), COALESCE(messages, 0), last_xp, created_at FROM users_old'
+    ))
+    sync_conn.execute(text('DROP TABLE users_old'))
+
+
+def _upgrade_custom_commands_table(sync_conn):
+    """Add the (guild_id, name) uniqueness save_custom_command's ON CONFLICT relies on."""
+    insp = inspect(sync_conn)
+    if not insp.has_table('custom_commands'):
+        return
+    keys = [uc['column_names'] for uc in insp.get_unique_constraints('custom_commands')]
+    keys += [ix['column_names'] for ix in insp.get_indexes('custom_commands') if ix['unique']]
+    if any(set(cols) == {'guild_id', 'name'} for cols in keys):
+        return
+    # Fails (and stops startup) if a guild already has two commands with the same name
+    logger.warning("Adding a unique (guild_id, name) index to custom_commands")
+    sync_conn.execute(text('CREATE UNIQUE INDEX uq_cmd_guild_name ON custom_commands (guild_id, name)'))
+
+
+def _upgrade_schema(sync_conn):
+    """Bring tables created by older versions up to the current models (create_all never alters)."""
+    _upgrade_users_table(sync_conn)
+    _upgrade_custom_commands_table(sync_conn)
+    # Indexes added to the models since a table was created
+    insp = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if insp.has_table(table.name):
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Pool settings for the engine, chosen by database backend."""
+    if url.startswith('postgresql'):
+        return {
+            'pool_size': 20,
+            'max_overflow': 30,
+            'pool_pre_ping': True,
+            'pool_recycle': 3600,
+            'pool_timeout': 30,
+        }
+    if url.startswith('sqlite') and (':memory:' in url or url.rstrip('/').endswith(':')):
+        # An in-memory database only exists on its one connection
+        return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    return {}
 
 
 class Database:
     """Async database handler."""
     
     def __init__(self):
-        self.engine = create_async_engine(Config.DATABASE_URL, echo=False)
-        self.async_session = sessionmaker(
-            self.engine, class_=AsyncSession, expire_on_commit=False
+        self.engine = create_async_engine(
+            Config.DATABASE_URL, echo=False, query_cache_size=1200, **_engine_options(Config.DATABASE_URL)
         )
+        # Refuse to start rather than fail every background flush later
+        if self.engine.dialect.name not in _SUPPORTED_DIALECTS:
+            raise RuntimeError(
+                f"Unsupported database '{self.engine.dialect.name}': VelvetBot needs PostgreSQL or SQLite"
+            )
+        if self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine.sync_engine, 'connect', _set_sqlite_pragmas)
+        self.async_session = async_sessionmaker(self.engine, expire_on_commit=False)
+        # Read caches; expire_on_commit=False keeps the cached objects usable
+        self._user_cache = TTLCache(maxsize=10_000, ttl=60)  # (user_id, guild_id) -> User column values
+        self._cmd_cache = TTLCache(maxsize=5_000, ttl=300)  # (guild_id, name) -> CustomCommand column values
+        self._cmd_list_cache = TTLCache(maxsize=1_000, ttl=300)  # guild_id -> [CustomCommand column values]
+        # Append-only rows (warnings, stream logs) waiting for the background flusher.
+        # Kept as plain column values so a failed write can simply be retried.
+        self._pending: List[Tuple[Table, Dict[str, Any]]] = []
+        self._pending_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        # XP and message deltas per (user_id, guild_id), written out every _COUNTER_FLUSH_INTERVAL
+        self._xp_buffer: Dict[Tuple[int, int], int] = defaultdict(int)
+        self._msg_buffer: Dict[Tuple[int, int], int] = defaultdict(int)
+        self._xp_totals = TTLCache(maxsize=10_000, ttl=600)  # (user_id, guild_id) -> xp incl. buffered
+        self._xp_lock = asyncio.Lock()
+        self._cmd_uses: Dict[int, int] = defaultdict(int)  # custom command id -> uses not yet written
+        self._flush_tasks: List[asyncio.Task] = []
+        self._closing = asyncio.Event()
     
     async def init(self):
         """Initialize database tables."""
         async with self.engine.begin() as conn:
+            await conn.run_sync(_upgrade_schema)
             await conn.run_sync(Base.metadata.create_all)
+        self._flush_tasks = [
+            asyncio.create_task(self._flusher()),
+            asyncio.create_task(self._counter_flusher())
+        ]
+    
+    async def close(self):
+        """Stop the flushers, write out anything still buffered and dispose of the engine."""
+        # Let the flushers finish any write in progress rather than cancelling it mid-commit
+        self._closing.set()
+        self._pending_event.set()
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write queued rows on shutdown ({len(self._pending)} lost): {e}")
+        try:
+            await self.flush_xp()
+        except Exception as e:
+            logger.error(f"Failed to write buffered XP on shutdown ({len(self._xp_buffer)} users lost): {e}")
+        try:
+            await self.flush_command_uses()
+        except Exception as e:
+            logger.error(f"Failed to write command uses on shutdown: {e}")
+        await self.engine.dispose()
+    
+    def _queue_write(self, model, **values):
+        """Queue a new row for the next batched insert."""
+        self._pending.append((model.__table__, values))
+        self._pending_event.set()
+    
+    async def _wait_closing(self, timeout: float) -> bool:
+        """Sleep for up to timeout seconds; True if close() was called meanwhile."""
+        try:
+            await asyncio.wait_for(self._closing.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._closing.is_set()
+    
+    async def _flusher(self):
+        """Background task: batch up queued rows and insert them together."""
+        while True:
+            await self._pending_event.wait()
+            # Give a burst a moment to collect before writing it out
+            if await self._wait_closing(_WRITE_FLUSH_INTERVAL):
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to write queued rows, retrying in {_WRITE_RETRY_DELAY}s: {e}")
+                if await self._wait_closing(_WRITE_RETRY_DELAY):
+                    return
+    
+    async def flush(self):
+        """Insert every queued row now."""
+        async with self._flush_lock:
+            self._pending_event.clear()
+            while self._pending:
+                batch = self._pending[:_WRITE_BATCH_SIZE]
+                del self._pending[:_WRITE_BATCH_SIZE]
+                try:
+                    if self.engine.url.drivername == 'postgresql+asyncpg':
+                        await self._copy_batch(batch)
+                    else:
+                        async with self.get_session() as session:
+                            for table, rows in self._group_by_table(batch).items():
+                                await session.execute(insert(table), rows)
+                            await session.commit()
+                except BaseException:
+                    # Put the batch back (cancellation included) so no row is dropped
+                    self._pending[:0] = batch
+                    self._pending_event.set()
+                    raise
     
+    @staticmethod
+    def _group_by_table(batch: List[Tuple[Table, Dict[str, Any]]]) -> Dict[Table, List[Dict[str, Any]]]:
+        """Split a batch of queued rows per table."""
+        by_table = defaultdict(list)
+        for table, values in batch:
+            by_table[table].append(values)
+        return by_table
+    
+    async def _copy_batch(self, batch: List[Tuple[Table, Dict[str, Any]]]):
+        """Bulk-load a batch with asyncpg's COPY, one table at a time in a single transaction."""
+        async with self.engine.connect() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            async with raw.transaction():
+                for table, rows in self._group_by_table(batch).items():
+                    # Leave unset server-default columns out so the database fills them
+                    columns = [
+                        c for c in table.columns
+                        if not c.primary_key
+                        and not (
+                            c.server_default is not None and c.default is None
+                            and all(r.get(c.key) is None for r in rows)
+                        )
+                    ]
+                    await raw.copy_records_to_table(
+                        table.name,
+                        records=[tuple(_copy_value(row, c) for c in columns) for row in rows],
+                        columns=[c.name for c in columns]
+                    )
+    
+    def _insert(self, model):
+        """Dialect-specific INSERT supporting on_conflict_do_update (PostgreSQL/SQLite)."""
+        dialect = self.engine.dialect.name
+        if dialect == 'postgresql':
+            return postgresql.insert(model)
+        if dialect == 'sqlite':
+            return sqlite.insert(model)
+        raise NotImplementedError(f"Upserts are only supported on PostgreSQL and SQLite, not {dialect}")
+
     def get_session(self) -> AsyncSession:
         """Get a new database session."""
         return self.async_session()
 
+    @asynccontextmanager
+    async def _use_session(self, session: Optional[AsyncSession]) -> AsyncIterator[AsyncSession]:
+        """Use the caller's session as-is, or open (and commit) a fresh one."""
+        if session is not None:
+            # The caller owns the transaction and commits it
+            yield session
+            return
+        async with self.get_session() as session:
+            yield session
+            await session.commit()
+
     # User/XP Methods
-    async def get_or_create_user(self, user_id: int, guild_id: int) -> User:
+    async def get_or_create_user(self, user_id: int, guild_id: int, session: Optional[AsyncSession] = None) -> User:
         """Get or create a user record."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(User).where(User.user_id == user_id, User.guild_id == guild_id)
-            )
+        key = (user_id, guild_id)
+        values = self._user_cache.get(key)
+        if values is not None:
+            return self._user_from_values(values)
+        
+        async with self._use_session(session) as db_session:
+            result = await db_session.execute(_SEL_USER, {'uid': user_id, 'gid': guild_id})
             user = result.scalar_one_or_none()
             if not user:
                 user = User(user_id=user_id, guild_id=guild_id)
-                session.add(user)
-                await session.commit()
-                await session.refresh(user)
-            return user
+                db_session.add(user)
+                await db_session.flush()
+            if session is not None:
+                # The caller's transaction may still roll back, so don't cache what isn't committed
+                return user
+            values = _column_values(user)
+        # Only reached once _use_session has committed our own session
+        self._user_cache[key] = values
+        return self._user_from_values(values)
+    
+    def _user_from_values(self, values: Dict[str, Any]) -> User:
+        """Fresh detached User from cached column values, with any XP still in the buffer included."""
+        xp = self._xp_totals.get((values['user_id'], values['guild_id']))
+        if xp is not None:
+            values = {**values, 'xp': xp, 'level': (xp // 100) + 1}
+        return _detached_copy(User, values)
     
     async def add_xp(self, user_id: int, guild_id: int, amount: int) -> tuple:
         """Add XP to a user. Returns (new_xp, new_level, leveled_up)."""
-        async with self.get_session() as session:
-            user = await self.get_or_create_user(user_id, guild_id)
-            old_level = user.level
-            user.xp += amount
-            user.messages += 1
-            user.last_xp = datetime.utcnow()
-            
-            # Calculate new level (simple formula: level = xp / 100)
-            new_level = (user.xp // 100) + 1
-            leveled_up = new_level > old_level
-            user.level = new_level
+        key = (user_id, guild_id)
+        old_xp = self._xp_totals.get(key)
+        if old_xp is None:
+            # Read under the flush lock so buffered XP is counted exactly once
+            async with self._xp_lock:
+                async with self.get_session() as session:
+                    db_xp = await session.scalar(
+                        select(User.xp).where(User.user_id == user_id, User.guild_id == guild_id)
+                    )
+                old_xp = (db_xp or 0) + self._xp_buffer.get(key, 0)
+        
+        # Buffered; the row is upserted by flush_xp
+        new_xp = old_xp + amount
+        self._xp_totals[key] = new_xp
+        self._xp_buffer[key] += amount
+        self._msg_buffer[key] += 1
+        
+        # Same formula as the computed column; a level-up means xp crossed a multiple of 100
+        new_level = (new_xp // 100) + 1
+        leveled_up = new_xp // 100 > old_xp // 100
+        return new_xp, new_level, leveled_up
+    
+    async def _counter_flusher(self):
+        """Background task: write buffered XP and command uses every _COUNTER_FLUSH_INTERVAL seconds."""
+        while not await self._wait_closing(_COUNTER_FLUSH_INTERVAL):
+            try:
+                await self.flush_xp()
+            except Exception as e:
+                logger.error(f"Failed to write buffered XP: {e}")
+            try:
+                await self.flush_command_uses()
+            except Exception as e:
+                logger.error(f"Failed to write command uses: {e}")
+    
+    async def flush_xp(self):
+        """Upsert all buffered XP in one executemany."""
+        async with self._xp_lock:
+            if not self._xp_buffer:
+                return
+            xp, msgs = self._xp_buffer, self._msg_buffer
+            self._xp_buffer, self._msg_buffer = defaultdict(int), defaultdict(int)
             
-            await session.commit()
-            return user.xp, new_level, leveled_up
-
-    async def get_leaderboard(self, guild_id: int, limit: int = 10) -> List[User]:
-        """Get XP leaderboard for a guild."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(User).where(User.guild_id == guild_id).order_by(User.xp.desc()).limit(limit)
+            stmt = self._insert(User.__table__).values(
+                user_id=bindparam('uid'), guild_id=bindparam('gid'), xp=bindparam('xp'), messages=bindparam('msgs')
             )
-            return result.scalars().all()
+            # Creates the row on a user's first message, otherwise adds the deltas in place
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id', 'guild_id'],
+                set_={
+                    'xp': User.__table__.c.xp + stmt.excluded.xp,
+                    'messages': User.__table__.c.messages + stmt.excluded.messages,
+                    # ON CONFLICT DO UPDATE does not apply Column.onupdate
+                    'last_xp': _UtcNow()
+                }
+            )
+            params = [
+                {'uid': uid, 'gid': gid, 'xp': delta, 'msgs': msgs[uid, gid]}
+                for (uid, gid), delta in xp.items()
+            ]
+            try:
+                async with self.get_session() as session:
+                    await session.execute(stmt, params)
+                    await session.commit()
+            except BaseException:
+                # Merge the deltas back so the next flush retries them
+                for key, delta in xp.items():
+                    self._xp_buffer[key] += delta
+                    self._msg_buffer[key] += msgs[key]
+                raise
+
+    async def get_leaderboard(self, guild_id: int, limit: int = 10,
+                              session: Optional[AsyncSession] = None) -> List[Tuple[int, int, int]]:
+        """Get XP leaderboard for a guild as (user_id, xp, level) rows."""
+        await self.flush_xp()
+        async with self._use_session(session) as session:
+            result = await session.execute(_SEL_LEADERBOARD, {'gid': guild_id, 'limit': limit})
+            return result.all()
 
     # Warning Methods
-    async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str):
+    async def add_warning(self, user_id: int, guild_id: int, moderator_id: int, reason: str,
+                          session: Optional[AsyncSession] = None):
         """Add a warning to a user."""
-        async with self.get_session() as session:
-            warn = WarnLog(user_id=user_id, guild_id=guild_id, moderator_id=moderator_id, reason=reason)
-            session.add(warn)
-            await session.commit()
+        values = dict(user_id=user_id, guild_id=guild_id, moderator_id=moderator_id, reason=reason)
+        if session is not None:
+            session.add(WarnLog(**values))
+        else:
+            self._queue_write(WarnLog, **values)
     
-    async def get_warnings(self, user_id: int, guild_id: int) -> List[Dict]:
-        """Get all warnings for a user."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(WarnLog).where(WarnLog.user_id == user_id, WarnLog.guild_id == guild_id)
-            )
-            warns = result.scalars().all()
-            return [{'reason': w.reason, 'created_at': w.created_at.strftime('%Y-%m-%d')} for w in warns]
+    async def get_warnings(self, user_id: int, guild_id: int, limit: int = 5,
+                           session: Optional[AsyncSession] = None) -> Tuple[int, List[Dict]]:
+        """Get a user's warning count and their most recent warnings (newest first)."""
+        await self.flush()
+        async with self._use_session(session) as session:
+            result = await session.execute(_SEL_WARNINGS, {'uid': user_id, 'gid': guild_id, 'limit': limit})
+            rows = result.all()
+            total = rows[0][2] if rows else 0
+            # Rows written while the column had no default can carry a NULL timestamp
+            return total, [
+                {'reason': r, 'created_at': c.strftime('%Y-%m-%d') if c else 'N/A'} for r, c, _ in rows
+            ]
     
-    async def clear_warnings(self, user_id: int, guild_id: int):
+    async def clear_warnings(self, user_id: int, guild_id: int, session: Optional[AsyncSession] = None):
         """Clear all warnings for a user."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(WarnLog).where(WarnLog.user_id == user_id, WarnLog.guild_id == guild_id)
-            )
-            for warn in result.scalars().all():
-                await session.delete(warn)
-            await session.commit()
+        await self.flush()
+        async with self._use_session(session) as session:
+            await session.execute(_DEL_WARNINGS, {'uid': user_id, 'gid': guild_id})
 
     # Stream Methods
-    async def log_stream(self, channel: str, platform: str, title: str):
+    async def log_stream(self, channel: str, platform: str, title: str, session: Optional[AsyncSession] = None):
         """Log a stream notification."""
-        async with self.get_session() as session:
-            alert = StreamAlert(channel=channel, platform=platform, stream_title=title, notified=True)
-            session.add(alert)
-            await session.commit()
+        values = dict(channel=channel, platform=platform, stream_title=title, notified=True)
+        if session is not None:
+            session.add(StreamAlert(**values))
+        else:
+            self._queue_write(StreamAlert, **values)
     
-    async def get_stream_stats(self) -> Dict[str, Any]:
+    async def get_stream_stats(self, session: Optional[AsyncSession] = None) -> Dict[str, Any]:
         """Get stream statistics."""
-        async with self.get_session() as session:
-            result = await session.execute(select(StreamAlert))
-            alerts = result.scalars().all()
-            
-            this_month = [a for a in alerts if a.started_at.month == datetime.utcnow().month]
-            platforms = set(a.platform for a in alerts)
+        await self.flush()
+        now = datetime.now(timezone.utc)
+        # Columns hold naive UTC timestamps
+        month_start = datetime(now.year, now.month, 1)
+        
+        async with self._use_session(session) as session:
+            total = await session.scalar(select(func.count()).select_from(StreamAlert))
+            this_month = await session.scalar(
+                select(func.count()).select_from(StreamAlert).where(StreamAlert.started_at >= month_start)
+            )
+            platforms = (await session.execute(select(StreamAlert.platform).distinct())).scalars().all()
             
             return {
-                'total': len(alerts),
-                'this_month': len(this_month),
+                'total': total,
+                'this_month': this_month,
                 'platforms': ', '.join(platforms) if platforms else 'None'
             }
 
@@ -213,18 +648,73 @@ class Database:
         pass
 
     # Custom Commands
-    async def get_custom_command(self, guild_id: int, name: str) -> Optional[CustomCommand]:
+    async def get_custom_command(self, guild_id: int, name: str,
+                                 session: Optional[AsyncSession] = None) -> Optional[CustomCommand]:
         """Get a custom command by name."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(CustomCommand).where(CustomCommand.guild_id == guild_id, CustomCommand.name == name)
-            )
-            return result.scalar_one_or_none()
+        key = (guild_id, name)
+        values = self._cmd_cache.get(key)
+        if values is None:
+            async with self._use_session(session) as session:
+                result = await session.execute(_SEL_CMD, {'gid': guild_id, 'name': name})
+                cmd = result.scalar_one_or_none()
+                values = _NOT_FOUND if cmd is None else _column_values(cmd)
+            # Misses are cached too, since most lookups are for names that aren't commands
+            self._cmd_cache[key] = values
+        return None if values is _NOT_FOUND else self._cmd_from_values(values)
     
-    async def get_all_custom_commands(self, guild_id: int) -> List[CustomCommand]:
+    async def get_all_custom_commands(self, guild_id: int,
+                                      session: Optional[AsyncSession] = None) -> List[CustomCommand]:
         """Get all custom commands for a guild."""
-        async with self.get_session() as session:
-            result = await session.execute(
-                select(CustomCommand).where(CustomCommand.guild_id == guild_id)
-            )
-            return result.scalars().all()
+        rows = self._cmd_list_cache.get(guild_id)
+        if rows is None:
+            async with self._use_session(session) as session:
+                result = await session.execute(_SEL_GUILD_CMDS, {'gid': guild_id})
+                rows = [_column_values(cmd) for cmd in result.scalars()]
+            self._cmd_list_cache[guild_id] = rows
+        return [self._cmd_from_values(values) for values in rows]
+    
+    def _cmd_from_values(self, values: Dict[str, Any]) -> CustomCommand:
+        """Fresh detached CustomCommand from cached column values, counting uses not yet written."""
+        pending = self._cmd_uses.get(values['id'])
+        if pending:
+            values = {**values, 'uses': (values['uses'] or 0) + pending}
+        return _detached_copy(CustomCommand, values)
+    
+    async def save_custom_command(self, guild_id: int, name: str, response: str, created_by: int,
+                                  is_embed: bool = False, session: Optional[AsyncSession] = None):
+        """Create a custom command, or update its response if the name is taken."""
+        stmt = self._insert(CustomCommand).values(
+            guild_id=guild_id, name=name, response=response, created_by=created_by, is_embed=is_embed, uses=0
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['guild_id', 'name'],
+            set_={'response': stmt.excluded.response, 'is_embed': stmt.excluded.is_embed}
+        )
+        async with self._use_session(session) as session:
+            await session.execute(stmt)
+        self.invalidate_cmd(guild_id, name)
+    
+    def incr_command_uses(self, cmd_id: int):
+        """Count a custom command invocation; written out by the background flusher."""
+        self._cmd_uses[cmd_id] += 1
+    
+    async def flush_command_uses(self):
+        """Add the buffered use counts to custom_commands in one executemany."""
+        if not self._cmd_uses:
+            return
+        uses, self._cmd_uses = self._cmd_uses, defaultdict(int)
+        
+        try:
+            async with self.get_session() as session:
+                await session.execute(_INCR_CMD_USES, [{'cid': cid, 'n': n} for cid, n in uses.items()])
+                await session.commit()
+        except BaseException:
+            # Merge the counts back so the next flush retries them
+            for cid, n in uses.items():
+                self._cmd_uses[cid] += n
+            raise
+    
+    def invalidate_cmd(self, guild_id: int, name: str):
+        """Drop cached lookups for a custom command after it is created, edited or deleted."""
+        self._cmd_cache.pop((guild_id, name), None)
+        self._cmd_list_cache.pop(guild_id, None)